@@ -3,11 +3,16 @@
 """
 ISC DHCP to Kea DHCP migration script for OPNsense.
 
-Migrates one interface at a time from the legacy ISC DHCP configuration
+Migrates one or more interfaces from the legacy ISC DHCP configuration
 (stored in config.xml) to Kea DHCP via the OPNsense API.
 
+Requires Python 3.9+ and requests. If httpx and h2 are installed
+(pip install 'httpx[http2]'), API calls use HTTP/2 instead. If orjson is
+installed it is used to decode API responses.
+
 Usage:
     python isc2kea.py opt1 --api-key KEY --api-secret SECRET
+    python isc2kea.py opt1 opt2 lan --api-key KEY --api-secret SECRET
     python isc2kea.py opt1 --api-key KEY --api-secret SECRET --dry-run
     python isc2kea.py opt1 --config-file ./config.xml --api-key KEY --api-secret SECRET
 """
@@ -15,26 +20,62 @@ Usage:
 import argparse
 import ipaddress
 import logging
+import re
 import subprocess
 import sys
 import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import BinaryIO, Iterator, Optional
 
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+
+try:
+    # Optional: HTTP/2 lets concurrent API calls share one TLS connection
+    import h2  # noqa: F401
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    # Optional: faster decoding of large search responses
+    import orjson
+except ImportError:
+    orjson = None
 
 # Suppress SSL warnings for self-signed certs
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 log = logging.getLogger(__name__)
 
+# Concurrent API requests in flight (kept below the HTTP connection pool size)
+API_WORKERS = 8
+API_POOL_SIZE = 16
+
+# Normalizes MAC addresses to colon-separated lowercase in one pass
+MAC_TRANSLATION = str.maketrans('ABCDEF-', 'abcdef:')
+
+# Case variants of the 'ok' status returned by service endpoints
+OK_STATUSES = frozenset({'ok', 'OK', 'Ok', 'oK'})
+
+# Runs of ISC domain-search separators (space/semicolon/comma)
+DOMAIN_SEARCH_SEPARATORS = re.compile(r'[,; ]+')
+
 
 # ---------------------------------------------------------------------------
 # Data classes
 # ---------------------------------------------------------------------------
 
-@dataclass
+# Slotted dataclasses (no per-instance __dict__) need Python 3.10; plain
+# dataclasses on 3.9, e.g. the macOS system python3
+DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**DATACLASS_OPTIONS)
 class StaticMapping:
     mac: str
     ipaddr: str
@@ -42,18 +83,20 @@ class StaticMapping:
     description: str = ''
 
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class NumberOption:
     number: str
     type: str
     value: str
 
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class DhcpInterfaceConfig:
     interface: str          # internal name, e.g. opt1
     enabled: bool = False
     subnet: str = ''        # CIDR, e.g. 10.2.21.0/24
+    network_int: int = 0    # subnet network address as an integer
+    prefix_len: int = 0     # subnet prefix length
     ipaddr: str = ''        # interface IP
     range_from: str = ''
     range_to: str = ''
@@ -74,30 +117,68 @@ class DhcpInterfaceConfig:
     # Derived DDNS fields
     ddns_forward_zone: str = ''
     ddns_prefix: str = ''
+    ddns_algorithm_kea: str = 'HMAC-MD5'
     # Static mappings
     static_mappings: list = field(default_factory=list)
     # Custom options
     number_options: list = field(default_factory=list)
 
 
+@dataclass(**DATACLASS_OPTIONS)
+class KeaState:
+    """Existing Kea resources, fetched once and indexed for O(1) lookups."""
+    interfaces: dict = field(default_factory=dict)      # selected name -> None (ordered)
+    tsig_keys: dict = field(default_factory=dict)       # name -> uuid
+    forward_zones: dict = field(default_factory=dict)   # name -> uuid
+    reverse_zones: dict = field(default_factory=dict)   # name -> uuid
+    subnets: dict = field(default_factory=dict)         # CIDR -> uuid
+    reservations: dict = field(default_factory=dict)    # subnet uuid -> set of MACs
+
+
 # ---------------------------------------------------------------------------
 # Config reader
 # ---------------------------------------------------------------------------
 
 class ConfigReader:
-    """Reads config.xml from a local file or via SSH."""
+    """Streams config.xml from a local file or via SSH."""
+
+    # Share one SSH master connection between runs so repeated invocations
+    # skip the key exchange and authentication handshake
+    SSH_OPTIONS = [
+        '-o', 'ControlMaster=auto',
+        '-o', 'ControlPath=~/.ssh/isc2kea-%C',
+        '-o', 'ControlPersist=60s',
+    ]
 
     @staticmethod
-    def read(host: str, ssh_user: str, config_file: Optional[str] = None) -> ET.Element:
+    @contextmanager
+    def stream(host: str, ssh_user: str, config_file: Optional[str] = None) -> Iterator[BinaryIO]:
+        """Yield config.xml as a binary stream, without buffering it in memory."""
         if config_file:
             log.info('Reading config from local file: %s', config_file)
-            tree = ET.parse(config_file)
-            return tree.getroot()
+            with open(config_file, 'rb') as f:
+                yield f
+            return
 
         log.info('Fetching config.xml from %s via SSH', host)
-        cmd = ['ssh', f'{ssh_user}@{host}', 'cat /conf/config.xml']
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return ET.fromstring(result.stdout)
+        cmd = ['ssh', *ConfigReader.SSH_OPTIONS, f'{ssh_user}@{host}', 'cat /conf/config.xml']
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+            try:
+                yield proc.stdout
+            except ET.ParseError:
+                # A failed ssh leaves an empty or truncated document, read up
+                # to EOF. Otherwise the XML itself is bad and ssh may still be
+                # writing: stop it rather than wait on a full pipe
+                at_eof = not proc.stdout.read(1)
+                if not at_eof:
+                    proc.kill()
+                if proc.wait() != 0 and at_eof:
+                    raise subprocess.CalledProcessError(proc.returncode, cmd) from None
+                raise
+            finally:
+                # The parser stops reading once it has what it needs; closing
+                # the pipe ends ssh instead of draining the rest of the file
+                proc.stdout.close()
 
 
 # ---------------------------------------------------------------------------
@@ -105,7 +186,7 @@ class ConfigReader:
 # ---------------------------------------------------------------------------
 
 class IscDhcpParser:
-    """Parses ISC DHCP config for one interface from config.xml."""
+    """Parses ISC DHCP config for a set of interfaces from config.xml."""
 
     ALGORITHM_MAP = {
         'hmac-md5': 'HMAC-MD5',
@@ -116,12 +197,90 @@ class IscDhcpParser:
         'hmac-sha512': 'HMAC-SHA512',
     }
 
+    SECTIONS = ('interfaces', 'dhcpd')
+
+    @staticmethod
+    def load(source: BinaryIO, interfaces: list) -> ET.Element:
+        """Incrementally parse config.xml, keeping only the subtrees for interfaces.
+
+        Everything outside <interfaces>/<interface> and <dhcpd>/<interface> is
+        discarded as soon as it has been parsed, and parsing stops once all
+        requested subtrees are complete, so the full document tree is never
+        held in memory.
+        """
+        wanted = set(interfaces)
+        root = None
+        stack = []
+        found = set()
+        for event, elem in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                stack.append(elem)
+                continue
+            stack.pop()
+            depth = len(stack)
+            if depth == 1:
+                # Top-level section under <opnsense>
+                keep = elem.tag in IscDhcpParser.SECTIONS
+            elif depth == 2:
+                # Per-interface entry inside a section
+                section = stack[1].tag
+                keep = section in IscDhcpParser.SECTIONS and elem.tag in wanted
+                if keep:
+                    found.add((section, elem.tag))
+                    if len(found) == len(IscDhcpParser.SECTIONS) * len(wanted):
+                        break
+            else:
+                continue
+            if not keep:
+                elem.clear()
+                # Pruned as we go, so the parent only ever holds a few children
+                stack[-1].remove(elem)
+        return root
+
     @staticmethod
-    def parse(root: ET.Element, interface: str, forward_zone_override: Optional[str] = None) -> DhcpInterfaceConfig:
+    def _index(el: ET.Element) -> defaultdict:
+        """Group the direct children of el by tag in a single pass."""
+        children = defaultdict(list)
+        for child in el:
+            children[child.tag].append(child)
+        return children
+
+    @staticmethod
+    def _text(children: dict, tag: str, default: str = '') -> str:
+        """Equivalent of el.findtext(tag, default) on an _index() result."""
+        if tag not in children:
+            return default
+        return children[tag][0].text or ''
+
+    @staticmethod
+    def _texts(el: ET.Element) -> dict:
+        """Map child tag -> text in one pass, first child winning like findtext()."""
+        texts = {}
+        for child in el:
+            texts.setdefault(child.tag, child.text or '')
+        return texts
+
+    @staticmethod
+    def parse(source: BinaryIO, interfaces: list,
+              forward_zone_override: Optional[str] = None) -> list:
+        """Parse the ISC DHCP config of each interface in one pass over config.xml."""
+        root = IscDhcpParser.load(source, interfaces)
+        # <interfaces> and <dhcpd> are direct children of <opnsense>
+        sections = {child.tag: child for child in root}
+        return [IscDhcpParser._parse_interface(sections, interface, forward_zone_override)
+                for interface in interfaces]
+
+    @staticmethod
+    def _parse_interface(sections: dict, interface: str,
+                         forward_zone_override: Optional[str]) -> DhcpInterfaceConfig:
         cfg = DhcpInterfaceConfig(interface=interface)
 
         # Get interface IP/subnet from <interfaces>
-        iface_el = root.find(f'interfaces/{interface}')
+        iface_el = None
+        if 'interfaces' in sections:
+            iface_el = sections['interfaces'].find(interface)
         if iface_el is None:
             raise SystemExit(f'Interface {interface!r} not found in config.xml <interfaces>')
 
@@ -130,43 +289,53 @@ class IscDhcpParser:
         if ipaddr and subnet_bits:
             net = ipaddress.IPv4Network(f'{ipaddr}/{subnet_bits}', strict=False)
             cfg.subnet = str(net)
+            cfg.network_int = int(net.network_address)
+            cfg.prefix_len = net.prefixlen
             cfg.ipaddr = ipaddr
 
         # Get DHCP config from <dhcpd>
-        dhcp_el = root.find(f'dhcpd/{interface}')
+        dhcp_el = None
+        if 'dhcpd' in sections:
+            dhcp_el = sections['dhcpd'].find(interface)
         if dhcp_el is None:
             raise SystemExit(f'No ISC DHCP config found for interface {interface!r} in <dhcpd>')
 
-        cfg.enabled = dhcp_el.find('enable') is not None
-        cfg.gateway = dhcp_el.findtext('gateway', '')
-        cfg.domain = dhcp_el.findtext('domain', '')
-        cfg.domain_search = dhcp_el.findtext('domainsearchlist', '')
-        cfg.default_lease_time = dhcp_el.findtext('defaultleasetime', '')
-        cfg.max_lease_time = dhcp_el.findtext('maxleasetime', '')
+        # Index children once instead of rescanning dhcp_el for every field
+        children = IscDhcpParser._index(dhcp_el)
+        text = IscDhcpParser._text
+
+        cfg.enabled = 'enable' in children
+        cfg.gateway = text(children, 'gateway')
+        cfg.domain = text(children, 'domain')
+        cfg.domain_search = text(children, 'domainsearchlist')
+        cfg.default_lease_time = text(children, 'defaultleasetime')
+        cfg.max_lease_time = text(children, 'maxleasetime')
 
         # DNS servers
-        for dns_el in dhcp_el.findall('dnsserver'):
+        for dns_el in children['dnsserver']:
             if dns_el.text:
                 cfg.dns_servers.append(dns_el.text)
 
         # NTP servers
-        for ntp_el in dhcp_el.findall('ntpserver'):
+        for ntp_el in children['ntpserver']:
             if ntp_el.text:
                 cfg.ntp_servers.append(ntp_el.text)
 
         # Range
-        range_el = dhcp_el.find('range')
-        if range_el is not None:
+        if 'range' in children:
+            range_el = children['range'][0]
             cfg.range_from = range_el.findtext('from', '')
             cfg.range_to = range_el.findtext('to', '')
 
         # DDNS settings
-        cfg.ddns_enable = dhcp_el.find('ddnsupdate') is not None
-        cfg.ddns_domainname = dhcp_el.findtext('ddnsdomain', '')
-        cfg.ddns_domainprimary = dhcp_el.findtext('ddnsdomainprimary', '')
-        cfg.ddns_domainkey = dhcp_el.findtext('ddnsdomainkey', '')
-        cfg.ddns_domainkeyname = dhcp_el.findtext('ddnsdomainkeyname', '')
-        cfg.ddns_domainalgorithm = dhcp_el.findtext('ddnsdomainalgorithm', 'hmac-md5')
+        cfg.ddns_enable = 'ddnsupdate' in children
+        cfg.ddns_domainname = text(children, 'ddnsdomain')
+        cfg.ddns_domainprimary = text(children, 'ddnsdomainprimary')
+        cfg.ddns_domainkey = text(children, 'ddnsdomainkey')
+        cfg.ddns_domainkeyname = text(children, 'ddnsdomainkeyname')
+        cfg.ddns_domainalgorithm = text(children, 'ddnsdomainalgorithm', 'hmac-md5')
+        cfg.ddns_algorithm_kea = IscDhcpParser.ALGORITHM_MAP.get(
+            cfg.ddns_domainalgorithm.lower(), 'HMAC-SHA256')
 
         # Derive forward zone and prefix from ddnsdomainname
         # e.g. casa.dyn.bgwlan.nl -> prefix=casa, zone=dyn.bgwlan.nl
@@ -188,27 +357,27 @@ class IscDhcpParser:
                     cfg.ddns_forward_zone = cfg.ddns_domainname
 
         # Static mappings
-        for sm_el in dhcp_el.findall('staticmap'):
-            mac = sm_el.findtext('mac', '')
-            ipaddr = sm_el.findtext('ipaddr', '')
+        for sm_el in children['staticmap']:
+            sm = IscDhcpParser._texts(sm_el)
+            mac = sm.get('mac', '')
             if mac:
                 cfg.static_mappings.append(StaticMapping(
                     mac=mac,
-                    ipaddr=ipaddr,
-                    hostname=sm_el.findtext('hostname', ''),
-                    description=sm_el.findtext('descr', ''),
+                    ipaddr=sm.get('ipaddr', ''),
+                    hostname=sm.get('hostname', ''),
+                    description=sm.get('descr', ''),
                 ))
 
         # Number options (skip empty <item/> placeholders)
-        numberopts_el = dhcp_el.find('numberoptions')
-        if numberopts_el is not None:
-            for item_el in numberopts_el.findall('item'):
-                number = item_el.findtext('number', '')
+        if 'numberoptions' in children:
+            for item_el in children['numberoptions'][0].iterfind('item'):
+                item = IscDhcpParser._texts(item_el)
+                number = item.get('number', '')
                 if number:
                     cfg.number_options.append(NumberOption(
                         number=number,
-                        type=item_el.findtext('type', ''),
-                        value=item_el.findtext('value', ''),
+                        type=item.get('type', ''),
+                        value=item.get('value', ''),
                     ))
 
         return cfg
@@ -224,30 +393,53 @@ class KeaApiClient:
     def __init__(self, host: str, api_key: str, api_secret: str):
         self.base_url = f'https://{host}/api'
         self.auth = (api_key, api_secret)
+        self._settings_cache = None
+        if httpx is not None:
+            # Falls back to HTTP/1.1 keep-alive if the server doesn't offer h2.
+            # No timeout, like the requests path: httpx's 5s default is too
+            # short for reconfigure and for large rowCount=-1 searches
+            limits = httpx.Limits(max_connections=API_POOL_SIZE,
+                                  max_keepalive_connections=API_POOL_SIZE)
+            self.session = httpx.Client(http2=True, verify=False, auth=self.auth,
+                                        limits=limits, timeout=None)
+            return
         self.session = requests.Session()
         self.session.auth = self.auth
         self.session.verify = False
+        # Keep enough pooled keep-alive connections for concurrent requests
+        adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE)
+        self.session.mount('https://', adapter)
 
     def _get(self, path: str) -> dict:
         url = f'{self.base_url}{path}'
         log.debug('GET %s', url)
         r = self.session.get(url)
         r.raise_for_status()
-        return r.json()
+        return self._json(r)
 
     def _post(self, path: str, data: Optional[dict] = None) -> dict:
         url = f'{self.base_url}{path}'
         log.debug('POST %s %s', url, data)
         r = self.session.post(url, json=data or {})
         r.raise_for_status()
+        return self._json(r)
+
+    @staticmethod
+    def _json(r) -> dict:
+        if orjson is not None:
+            return orjson.loads(r.content)
         return r.json()
 
     # -- Kea DHCPv4 general settings ----------------------------------------
 
     def get_settings(self) -> dict:
-        return self._get('/kea/dhcpv4/get')
+        # Cached until the next set_settings()
+        if self._settings_cache is None:
+            self._settings_cache = self._get('/kea/dhcpv4/get')
+        return self._settings_cache
 
     def set_settings(self, data: dict) -> dict:
+        self._settings_cache = None
         return self._post('/kea/dhcpv4/set', {'dhcpv4': data})
 
     # -- Kea DHCPv4 subnets -------------------------------------------------
@@ -321,18 +513,40 @@ class KeaApiClient:
 # ---------------------------------------------------------------------------
 
 class KeaMigrator:
-    """Orchestrates the migration of one ISC DHCP interface to Kea."""
+    """Orchestrates the migration of ISC DHCP interfaces to Kea."""
 
     def __init__(self, api: KeaApiClient, dry_run: bool = False):
         self.api = api
         self.dry_run = dry_run
+        self.state = KeaState()
 
-    def migrate(self, cfg: DhcpInterfaceConfig, reverse_zone: str = '',
+    def migrate(self, cfgs: list, reverse_zone: str = '',
                 no_reconfigure: bool = False):
-        log.info('=== Migrating interface %s (subnet %s) ===', cfg.interface, cfg.subnet)
+        for cfg in cfgs:
+            if not cfg.subnet:
+                raise SystemExit(f'No subnet could be determined for interface {cfg.interface}')
+
+        # Fetch existing Kea state once for the whole batch (independent
+        # lookups, run concurrently)
+        self.state = self._prefetch(cfgs)
+
+        for cfg in cfgs:
+            self._migrate_interface(cfg, reverse_zone)
+
+        # Step 9: Reconfigure once, after all interfaces are in place
+        if not no_reconfigure:
+            if self.dry_run:
+                log.info('[DRY RUN] Would reconfigure Kea service')
+            else:
+                log.info('Reconfiguring Kea service...')
+                resp = self.api.reconfigure()
+                log.info('Reconfigure response: %s', resp)
 
-        if not cfg.subnet:
-            raise SystemExit(f'No subnet could be determined for interface {cfg.interface}')
+        for cfg in cfgs:
+            log.info('Remember to manually disable ISC DHCP for interface %s', cfg.interface)
+
+    def _migrate_interface(self, cfg: DhcpInterfaceConfig, reverse_zone: str):
+        log.info('=== Migrating interface %s (subnet %s) ===', cfg.interface, cfg.subnet)
 
         self._print_summary(cfg)
 
@@ -363,17 +577,7 @@ class KeaMigrator:
             for opt in cfg.number_options:
                 log.warning('  Option %s (type=%s): %s', opt.number, opt.type, opt.value)
 
-        # Step 9: Reconfigure
-        if not no_reconfigure:
-            if self.dry_run:
-                log.info('[DRY RUN] Would reconfigure Kea service')
-            else:
-                log.info('Reconfiguring Kea service...')
-                resp = self.api.reconfigure()
-                log.info('Reconfigure response: %s', resp)
-
         log.info('=== Migration complete for %s ===', cfg.interface)
-        log.info('Remember to manually disable ISC DHCP for interface %s', cfg.interface)
 
     def _print_summary(self, cfg: DhcpInterfaceConfig):
         log.info('Interface: %s', cfg.interface)
@@ -391,49 +595,81 @@ class KeaMigrator:
         if cfg.number_options:
             log.info('Custom options: %d (will need manual migration)', len(cfg.number_options))
 
+    def _prefetch(self, cfgs: list) -> KeaState:
+        """Fetch settings and existing Kea resources concurrently and index them."""
+        if self.dry_run:
+            return KeaState()
+
+        lookups = {
+            'settings': self.api.get_settings,
+            'subnets': self.api.search_subnets,
+            'reservations': self.api.search_reservations,
+        }
+        if any(cfg.ddns_enable and cfg.ddns_forward_zone for cfg in cfgs):
+            lookups['tsig_keys'] = self.api.search_tsig_keys
+            lookups['forward_zones'] = self.api.search_forward_zones
+            lookups['reverse_zones'] = self.api.search_reverse_zones
+
+        with ThreadPoolExecutor(max_workers=API_WORKERS) as pool:
+            futures = {name: pool.submit(fn) for name, fn in lookups.items()}
+            results = {name: fut.result() for name, fut in futures.items()}
+
+        # interfaces is a dict of iface_name -> {value, selected}
+        general = results['settings'].get('dhcpv4', {}).get('general', {})
+        interfaces_field = general.get('interfaces', {})
+
+        state = KeaState(
+            interfaces={name: None for name, data in interfaces_field.items()
+                        if isinstance(data, dict) and data.get('selected', 0)},
+            tsig_keys=self._index_rows(results.get('tsig_keys', []), 'name'),
+            forward_zones=self._index_rows(results.get('forward_zones', []), 'name'),
+            reverse_zones=self._index_rows(results.get('reverse_zones', []), 'name'),
+            subnets=self._index_rows(results['subnets'], 'subnet'),
+        )
+        for row in results['reservations']:
+            state.reservations.setdefault(row.get('subnet'), set()).add(
+                row.get('hw_address', '').lower())
+        return state
+
+    @staticmethod
+    def _index_rows(rows: list, key: str) -> dict:
+        """Map rows[key] -> uuid, keeping the first row for duplicate keys."""
+        index = {}
+        for row in rows:
+            index.setdefault(row.get(key), row['uuid'])
+        return index
+
     def _ensure_interface(self, interface: str):
         """Add interface to Kea general.interfaces if not already present."""
         if self.dry_run:
             log.info('[DRY RUN] Would ensure %s is in Kea interfaces', interface)
             return
 
-        settings = self.api.get_settings()
-        general = settings.get('dhcpv4', {}).get('general', {})
-        interfaces_field = general.get('interfaces', {})
-
-        # interfaces is a dict of iface_name -> {value, selected}
-        already_selected = []
-        for iface_name, iface_data in interfaces_field.items():
-            if isinstance(iface_data, dict) and iface_data.get('selected', 0):
-                already_selected.append(iface_name)
-
+        already_selected = self.state.interfaces
         if interface in already_selected:
             log.info('Interface %s already in Kea interfaces', interface)
             return
 
-        already_selected.append(interface)
-        new_value = ','.join(already_selected)
+        new_value = ','.join([*already_selected, interface])
 
         log.info('Adding %s to Kea interfaces (new: %s)', interface, new_value)
         resp = self.api.set_settings({'general': {'interfaces': new_value}})
         self._check_response(resp, 'set interfaces')
+        already_selected[interface] = None
 
     def _ensure_ddns_key(self, cfg: DhcpInterfaceConfig) -> str:
         """Find or create the DDNS TSIG key. Returns UUID."""
-        algorithm = IscDhcpParser.ALGORITHM_MAP.get(
-            cfg.ddns_domainalgorithm.lower(), 'HMAC-SHA256')
+        algorithm = cfg.ddns_algorithm_kea
 
         if self.dry_run:
             log.info('[DRY RUN] Would ensure TSIG key: %s (algo=%s)', cfg.ddns_domainkeyname,
                      algorithm)
             return 'dry-run-key-uuid'
 
-        existing = self.api.search_tsig_keys()
-        for key_row in existing:
-            if key_row.get('name') == cfg.ddns_domainkeyname:
-                log.info('TSIG key %r already exists (uuid=%s)', cfg.ddns_domainkeyname,
-                         key_row['uuid'])
-                return key_row['uuid']
+        uuid = self.state.tsig_keys.get(cfg.ddns_domainkeyname)
+        if uuid:
+            log.info('TSIG key %r already exists (uuid=%s)', cfg.ddns_domainkeyname, uuid)
+            return uuid
 
         key_data = {
             'name': cfg.ddns_domainkeyname,
@@ -445,6 +681,7 @@ class KeaMigrator:
         resp = self.api.add_tsig_key(key_data)
         self._check_response(resp, 'add TSIG key')
         uuid = resp.get('uuid', '')
+        self.state.tsig_keys[cfg.ddns_domainkeyname] = uuid
         log.info('Created TSIG key uuid=%s', uuid)
         return uuid
 
@@ -455,12 +692,10 @@ class KeaMigrator:
                      cfg.ddns_forward_zone, cfg.ddns_domainprimary)
             return 'dry-run-fwd-zone-uuid'
 
-        existing = self.api.search_forward_zones()
-        for row in existing:
-            if row.get('name') == cfg.ddns_forward_zone:
-                log.info('Forward zone %r already exists (uuid=%s)',
-                         cfg.ddns_forward_zone, row['uuid'])
-                return row['uuid']
+        uuid = self.state.forward_zones.get(cfg.ddns_forward_zone)
+        if uuid:
+            log.info('Forward zone %r already exists (uuid=%s)', cfg.ddns_forward_zone, uuid)
+            return uuid
 
         zone_data = {
             'name': cfg.ddns_forward_zone,
@@ -474,6 +709,7 @@ class KeaMigrator:
         resp = self.api.add_forward_zone(zone_data)
         self._check_response(resp, 'add forward zone')
         uuid = resp.get('uuid', '')
+        self.state.forward_zones[cfg.ddns_forward_zone] = uuid
         log.info('Created forward zone uuid=%s', uuid)
         return uuid
 
@@ -482,27 +718,24 @@ class KeaMigrator:
         """Find or create the reverse DNS zone. Returns UUID."""
         if not reverse_zone:
             # Derive from subnet: 10.0.10.0/24 -> 10.0.10.in-addr.arpa
-            net = ipaddress.IPv4Network(cfg.subnet, strict=False)
-            prefix_len = net.prefixlen
-            octets = str(net.network_address).split('.')
-            if prefix_len >= 24:
-                reverse_zone = f'{octets[2]}.{octets[1]}.{octets[0]}.in-addr.arpa'
-            elif prefix_len >= 16:
-                reverse_zone = f'{octets[1]}.{octets[0]}.in-addr.arpa'
+            n = cfg.network_int
+            o1, o2, o3 = (n >> 24) & 0xff, (n >> 16) & 0xff, (n >> 8) & 0xff
+            if cfg.prefix_len >= 24:
+                reverse_zone = f'{o3}.{o2}.{o1}.in-addr.arpa'
+            elif cfg.prefix_len >= 16:
+                reverse_zone = f'{o2}.{o1}.in-addr.arpa'
             else:
-                reverse_zone = f'{octets[0]}.in-addr.arpa'
+                reverse_zone = f'{o1}.in-addr.arpa'
 
         if self.dry_run:
             log.info('[DRY RUN] Would ensure reverse zone: %s server=%s',
                      reverse_zone, cfg.ddns_domainprimary)
             return 'dry-run-rev-zone-uuid'
 
-        existing = self.api.search_reverse_zones()
-        for row in existing:
-            if row.get('name') == reverse_zone:
-                log.info('Reverse zone %r already exists (uuid=%s)',
-                         reverse_zone, row['uuid'])
-                return row['uuid']
+        uuid = self.state.reverse_zones.get(reverse_zone)
+        if uuid:
+            log.info('Reverse zone %r already exists (uuid=%s)', reverse_zone, uuid)
+            return uuid
 
         zone_data = {
             'name': reverse_zone,
@@ -516,6 +749,7 @@ class KeaMigrator:
         resp = self.api.add_reverse_zone(zone_data)
         self._check_response(resp, 'add reverse zone')
         uuid = resp.get('uuid', '')
+        self.state.reverse_zones[reverse_zone] = uuid
         log.info('Created reverse zone uuid=%s', uuid)
         return uuid
 
@@ -525,12 +759,11 @@ class KeaMigrator:
 
         if not self.dry_run:
             # Check for existing subnet with same CIDR
-            existing = self.api.search_subnets()
-            for row in existing:
-                if row.get('subnet') == cfg.subnet:
-                    log.warning('Subnet %s already exists (uuid=%s) — skipping creation',
-                                cfg.subnet, row['uuid'])
-                    return row['uuid']
+            uuid = self.state.subnets.get(cfg.subnet)
+            if uuid:
+                log.warning('Subnet %s already exists (uuid=%s) — skipping creation',
+                            cfg.subnet, uuid)
+                return uuid
 
         subnet_data = {
             'subnet': cfg.subnet,
@@ -548,11 +781,7 @@ class KeaMigrator:
             subnet_data['option_data']['domain_name'] = cfg.domain
         if cfg.domain_search:
             # ISC uses space/semicolon separated, Kea uses comma separated
-            search_list = cfg.domain_search.replace(';', ',').replace(' ', ',')
-            # Clean up multiple commas
-            while ',,' in search_list:
-                search_list = search_list.replace(',,', ',')
-            search_list = search_list.strip(',')
+            search_list = DOMAIN_SEARCH_SEPARATORS.sub(',', cfg.domain_search).strip(',')
             subnet_data['option_data']['domain_search'] = search_list
         if cfg.ntp_servers:
             subnet_data['option_data']['ntp_servers'] = ','.join(cfg.ntp_servers)
@@ -567,6 +796,7 @@ class KeaMigrator:
         resp = self.api.add_subnet(subnet_data)
         self._check_response(resp, 'add subnet')
         uuid = resp.get('uuid', '')
+        self.state.subnets[cfg.subnet] = uuid
         log.info('Created subnet uuid=%s', uuid)
         return uuid
 
@@ -599,19 +829,15 @@ class KeaMigrator:
             log.info('No static mappings to migrate')
             return
 
-        # Get existing reservations to avoid duplicates
-        existing_macs = set()
-        if not self.dry_run:
-            existing = self.api.search_reservations()
-            for row in existing:
-                if row.get('subnet') == subnet_uuid:
-                    existing_macs.add(row.get('hw_address', '').lower())
+        # Existing reservations in this subnet, to avoid duplicates
+        existing_macs = self.state.reservations.setdefault(subnet_uuid, set())
 
         created = 0
         skipped = 0
+        to_create = []
         for sm in cfg.static_mappings:
             # Normalize MAC to colon-separated lowercase
-            mac = sm.mac.lower().replace('-', ':')
+            mac = sm.mac.translate(MAC_TRANSLATION)
 
             if mac in existing_macs:
                 log.info('Reservation for %s already exists — skipping', mac)
@@ -636,13 +862,23 @@ class KeaMigrator:
                 continue
 
             log.info('Creating reservation: mac=%s ip=%s host=%s', mac, sm.ipaddr, sm.hostname)
-            resp = self.api.add_reservation(res_data)
-            validations = resp.get('validations', {})
-            if validations:
-                log.warning('Reservation failed for mac=%s ip=%s: %s', mac, sm.ipaddr, validations)
-                skipped += 1
-                continue
-            created += 1
+            to_create.append((sm, mac, res_data))
+
+        # Independent POSTs: submit concurrently over the pooled session
+        if to_create:
+            with ThreadPoolExecutor(max_workers=API_WORKERS) as pool:
+                futures = {pool.submit(self.api.add_reservation, res_data): (sm, mac)
+                           for sm, mac, res_data in to_create}
+                for fut in as_completed(futures):
+                    sm, mac = futures[fut]
+                    validations = fut.result().get('validations', {})
+                    if validations:
+                        log.warning('Reservation failed for mac=%s ip=%s: %s',
+                                    mac, sm.ipaddr, validations)
+                        skipped += 1
+                        continue
+                    existing_macs.add(mac)
+                    created += 1
 
         log.info('Reservations: %d created, %d skipped (duplicates/errors)', created, skipped)
 
@@ -663,7 +899,7 @@ class KeaMigrator:
         if resp.get('uuid'):
             return
         # Reconfigure returns status
-        if resp.get('status', '').lower() == 'ok':
+        if resp.get('status') in OK_STATUSES:
             return
         log.warning('Unexpected API response for %s: %s', action, resp)
 
@@ -675,7 +911,8 @@ class KeaMigrator:
 def main():
     parser = argparse.ArgumentParser(
         description='Migrate ISC DHCP interface config to Kea DHCP via OPNsense API')
-    parser.add_argument('interface', help='Interface name in config.xml (e.g. opt1, opt13, lan)')
+    parser.add_argument('interfaces', nargs='+', metavar='interface',
+                        help='Interface name(s) in config.xml (e.g. opt1, opt13, lan)')
     parser.add_argument('--host', default='casa.bgwlan.nl', help='Firewall hostname')
     parser.add_argument('--api-key', default='', help='OPNsense API key')
     parser.add_argument('--api-secret', default='', help='OPNsense API secret')
@@ -685,7 +922,8 @@ def main():
     parser.add_argument('--no-reconfigure', action='store_true',
                         help='Skip Kea service reconfigure')
     parser.add_argument('--forward-zone', help='Override forward DNS zone')
-    parser.add_argument('--reverse-zone', default='', help='Override reverse DNS zone')
+    parser.add_argument('--reverse-zone', default='',
+                        help='Override reverse DNS zone (single interface only)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose logging')
     args = parser.parse_args()
 
@@ -693,21 +931,30 @@ def main():
         level=logging.DEBUG if args.verbose else logging.INFO,
         format='%(levelname)s: %(message)s',
     )
+    # httpx logs every request at INFO; keep that for --verbose only
+    if not args.verbose:
+        logging.getLogger('httpx').setLevel(logging.WARNING)
 
     if not args.dry_run and (not args.api_key or not args.api_secret):
         parser.error('--api-key and --api-secret are required (unless --dry-run)')
 
-    # Read and parse config
-    root = ConfigReader.read(args.host, args.ssh_user, args.config_file)
-    cfg = IscDhcpParser.parse(root, args.interface, args.forward_zone)
+    interfaces = list(dict.fromkeys(args.interfaces))
+    # Each subnet has its own reverse zone; one override can't serve several
+    if args.reverse_zone and len(interfaces) > 1:
+        parser.error('--reverse-zone can only be used with a single interface')
+
+    # Read and parse config once for all interfaces
+    with ConfigReader.stream(args.host, args.ssh_user, args.config_file) as source:
+        cfgs = IscDhcpParser.parse(source, interfaces, args.forward_zone)
 
-    if not cfg.enabled:
-        log.warning('DHCP is not enabled for interface %s in ISC config', args.interface)
+    for cfg in cfgs:
+        if not cfg.enabled:
+            log.warning('DHCP is not enabled for interface %s in ISC config', cfg.interface)
 
     # API client and migrator
     api = KeaApiClient(args.host, args.api_key, args.api_secret)
     migrator = KeaMigrator(api, dry_run=args.dry_run)
-    migrator.migrate(cfg, reverse_zone=args.reverse_zone, no_reconfigure=args.no_reconfigure)
+    migrator.migrate(cfgs, reverse_zone=args.reverse_zone, no_reconfigure=args.no_reconfigure)
 
 
 if __name__ == '__main__':
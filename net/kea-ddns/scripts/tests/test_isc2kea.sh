@@ -0,0 +1,66 @@
+#!/bin/sh
+
+# Test: isc2kea.py reading config.xml through a fake ssh
+#
+# Workstation test for the migration script, run by hand from the
+# net/kea-ddns directory wherever isc2kea.py is used (needs python3 with
+# requests; ssh is replaced on PATH, no firewall involved):
+#
+#   sh scripts/tests/test_isc2kea.sh        (PYTHON=... to pick the interpreter)
+#
+# It is not part of functional_test.sh, which runs on the firewall and
+# sources its tests by name. For the same reason it doesn't source lib.sh,
+# whose preflight needs root and the on-box tools; pass/fail below print the
+# same [PASS]/[FAIL] lines.
+
+TESTS_DIR="$(cd "$(dirname "$0")" && pwd)"
+ISC2KEA="$TESTS_DIR/../isc2kea.py"
+PYTHON="${PYTHON:-python3}"
+
+# lib.sh does the on-box preflight (root, socat, ...); only its reporting is needed
+FAILED=0
+pass() { printf "\033[32m[PASS]\033[0m %s\n" "$1"; }
+fail() { FAILED=1; printf "\033[31m[FAIL]\033[0m %s\n" "$1"; }
+
+FAKE_BIN=$(mktemp -d)
+trap 'rm -rf "$FAKE_BIN"' EXIT
+
+run_isc2kea() {
+    PATH="$FAKE_BIN:$PATH" timeout 30 "$PYTHON" "$ISC2KEA" opt1 --dry-run --host fw.invalid \
+        >"$FAKE_BIN/out" 2>&1
+}
+
+# --- 1. Malformed XML followed by more than a pipe buffer of data ---
+cat > "$FAKE_BIN/ssh" <<'EOF'
+#!/bin/sh
+printf '<opnsense><interfaces><<<'
+head -c 5000000 /dev/zero | tr '\0' 'x'
+EOF
+chmod +x "$FAKE_BIN/ssh"
+
+run_isc2kea
+RC=$?
+if [ "$RC" -eq 124 ]; then
+    fail "isc2kea: hangs on malformed XML over ssh"
+elif [ "$RC" -ne 0 ] && grep -q 'ParseError' "$FAKE_BIN/out"; then
+    pass "isc2kea: malformed XML over ssh raises ParseError"
+else
+    fail "isc2kea: malformed XML over ssh (exit $RC): $(tail -n 1 "$FAKE_BIN/out")"
+fi
+
+# --- 2. ssh fails without output ---
+cat > "$FAKE_BIN/ssh" <<'EOF'
+#!/bin/sh
+echo "ssh: connect to host fw.invalid: Connection refused" >&2
+exit 255
+EOF
+
+run_isc2kea
+RC=$?
+if [ "$RC" -ne 0 ] && [ "$RC" -ne 124 ] && grep -q 'CalledProcessError' "$FAKE_BIN/out"; then
+    pass "isc2kea: failed ssh reported as CalledProcessError"
+else
+    fail "isc2kea: failed ssh (exit $RC): $(tail -n 1 "$FAKE_BIN/out")"
+fi
+
+exit "$FAILED"
@@ -31,8 +31,14 @@
 # via PKCS#11 (libykcs11). Designed to be forwarded over SSH (-R) so that
 # pkg repo on a remote build host can sign through the local YubiKey.
 #
-# The PIN is fetched at the time of each signing request. A fresh PKCS#11
-# session is opened per sign request to avoid stale session issues.
+# The PKCS#11 session is opened and logged in on the first signing request
+# and kept across requests; it is checked before each sign and rebuilt if it
+# went stale. The PIN is needed at login and, for slot 9c's always-
+# authenticate key, per signature; once fetched it is kept in memory for
+# --pin-ttl seconds (default 60). With a pin command, the PIN is fetched
+# again in the background after a sign once half the TTL has passed, so a
+# batch of signs doesn't wait on the command. The token is logged out after
+# 5 minutes without a signing request.
 #
 # Protocol (line-based over Unix socket):
 #   Request:  SIGN SHA256 <hex-encoded-32-byte-digest>\n
@@ -41,12 +47,22 @@
 #   Request:  PUBKEY\n
 #   Response: OK <base64-encoded-PEM-public-key>\n
 #
+#   Request:  STREAM\n
+#   Response: OK STREAM\n
+#             (the connection then stays open: any number of the requests
+#             above, each answered in order, until the client closes it)
+#
 #   Errors:   ERR <message>\n
 #
-# Requires: yubico-piv-tool (provides libykcs11), ykman (for pubkey export)
+#   Without STREAM the agent answers one request and closes the connection.
+#
+# Requires: yubico-piv-tool (provides libykcs11), and python cryptography
+#           (reads the public key over PKCS#11) or ykman (pubkey export).
+#           --test always needs cryptography to verify the signature.
 # Optional: PIV_PIN (env var, static PIN)
 #           PIV_PIN_COMMAND (env var, shell command that prints PIN to stdout)
-#           PIV_AGENT_SOCK (socket path, default ~/.piv-sign-agent/agent.sock)
+#           PIV_AGENT_SOCK (socket path, default ~/.piv-sign-agent/agent.sock;
+#                           @name for a Linux abstract socket)
 #           PIV_SLOT (PIV slot, default 9c)
 #           PKCS11_MODULE (path to libykcs11, auto-detected)
 #
@@ -54,25 +70,88 @@
 import argparse
 import atexit
 import base64
+import binascii
 import ctypes
 import getpass
 import hashlib
 import os
 import signal
 import socket
+import socketserver
+import struct
 import subprocess
 import sys
-import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+    from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicNumbers
+    from cryptography.hazmat.primitives.serialization import (
+        Encoding,
+        PublicFormat,
+        load_pem_public_key,
+    )
+except ImportError:
+    RSAPublicNumbers = None
 
 # ── PKCS#11 constants ───────────────────────────────────────────────
 
 CKF_SERIAL_SESSION = 0x04
 CKF_RW_SESSION = 0x02
 CKU_USER = 1
+CKU_CONTEXT_SPECIFIC = 2
+CKS_RO_USER_FUNCTIONS = 1
+CKS_RW_USER_FUNCTIONS = 3
 CKM_RSA_PKCS = 0x01
 CKA_CLASS = 0x00
+CKA_ID = 0x102
 CKA_SIGN = 0x108
+CKA_MODULUS = 0x120
+CKA_PUBLIC_EXPONENT = 0x122
+CKA_ALWAYS_AUTHENTICATE = 0x202
+CKO_PUBLIC_KEY = 0x02
 CKO_PRIVATE_KEY = 0x03
+CK_UNAVAILABLE_INFORMATION = ctypes.c_ulong(-1).value
+CKR_PIN_INCORRECT = 0xA0
+CKR_PIN_INVALID = 0xA1
+CKR_PIN_LEN_RANGE = 0xA2
+CKR_USER_ALREADY_LOGGED_IN = 0x100
+
+# CKA_ID libykcs11 assigns to the key objects of each PIV slot
+PIV_KEY_IDS = {"9a": 1, "9c": 2, "9d": 3, "9e": 4}
+
+# Return codes after which the session is rebuilt from C_Initialize
+CKR_SESSION_LOST = frozenset({
+    0x30,   # CKR_DEVICE_ERROR
+    0x32,   # CKR_DEVICE_REMOVED
+    0xB0,   # CKR_SESSION_CLOSED
+    0xB3,   # CKR_SESSION_HANDLE_INVALID
+    0xE0,   # CKR_TOKEN_NOT_PRESENT
+    0x101,  # CKR_USER_NOT_LOGGED_IN
+    0x190,  # CKR_CRYPTOKI_NOT_INITIALIZED
+})
+SIGN_RETRIES = 1
+
+# Seconds without a sign before the token is logged out
+IDLE_LOGOUT = 300
+
+# Default seconds the agent keeps a fetched PIN in memory (--pin-ttl)
+PIN_TTL = 60
+
+# Connections served concurrently (signing itself is serialized), and the
+# socket listen backlog for bursts of sign requests
+AGENT_WORKERS = 4
+LISTEN_BACKLOG = 64
+
+# Seconds a client may take to send its request or read the response
+CONNECTION_TIMEOUT = 60
+
+# Name used by --abstract (Linux abstract socket, no file on disk)
+ABSTRACT_SOCKET = "@piv-sign-agent"
 
 # DER-encoded DigestInfo prefix for SHA-256 (19 bytes)
 SHA256_DER_PREFIX = bytes([
@@ -81,120 +160,409 @@ SHA256_DER_PREFIX = bytes([
     0x00, 0x04, 0x20,
 ])
 
+# Request prefix of the signing command, matched on the raw request bytes
+_SIGN_PREFIX = b"SIGN SHA256 "
+
 
 # ── PKCS#11 ctypes structures ───────────────────────────────────────
 
+# Scalar types from pkcs11t.h
+CK_ULONG = ctypes.c_ulong
+CK_RV = CK_ULONG
+CK_FLAGS = CK_ULONG
+CK_SLOT_ID = CK_ULONG
+CK_SESSION_HANDLE = CK_ULONG
+CK_OBJECT_HANDLE = CK_ULONG
+CK_USER_TYPE = CK_ULONG
+CK_BBOOL = ctypes.c_ubyte
+
 
 class CK_ATTRIBUTE(ctypes.Structure):
     _fields_ = [
-        ("type", ctypes.c_ulong),
+        ("type", CK_ULONG),
         ("pValue", ctypes.c_void_p),
-        ("ulValueLen", ctypes.c_ulong),
+        ("ulValueLen", CK_ULONG),
     ]
 
 
 class CK_MECHANISM(ctypes.Structure):
     _fields_ = [
-        ("mechanism", ctypes.c_ulong),
+        ("mechanism", CK_ULONG),
         ("pParameter", ctypes.c_void_p),
-        ("ulParameterLen", ctypes.c_ulong),
+        ("ulParameterLen", CK_ULONG),
     ]
 
 
-# ── PKCS#11 one-shot signer ─────────────────────────────────────────
-
+class CK_SESSION_INFO(ctypes.Structure):
+    _fields_ = [
+        ("slotID", CK_SLOT_ID),
+        ("state", CK_ULONG),
+        ("flags", CK_FLAGS),
+        ("ulDeviceError", CK_ULONG),
+    ]
 
-def pkcs11_sign(module_path, pin, digest, touch=True):
-    """Open a PKCS#11 session, sign a digest, close the session.
 
-    Opens a fresh session each time to avoid stale session issues (e.g.
-    after ykman calls or YubiKey re-insertion). Returns raw PKCS#1 v1.5
-    RSA signature bytes. Set touch=False to suppress touch prompts.
+# Prototypes (pkcs11f.h) of every function the agent calls. All return
+# CK_RV; applied once when the module is loaded.
+PKCS11_PROTOTYPES = {
+    "C_Initialize": [ctypes.c_void_p],
+    "C_Finalize": [ctypes.c_void_p],
+    "C_GetSlotList": [
+        CK_BBOOL, ctypes.POINTER(CK_SLOT_ID), ctypes.POINTER(CK_ULONG),
+    ],
+    "C_OpenSession": [
+        CK_SLOT_ID, CK_FLAGS, ctypes.c_void_p, ctypes.c_void_p,
+        ctypes.POINTER(CK_SESSION_HANDLE),
+    ],
+    "C_CloseSession": [CK_SESSION_HANDLE],
+    "C_GetSessionInfo": [CK_SESSION_HANDLE, ctypes.POINTER(CK_SESSION_INFO)],
+    "C_Login": [CK_SESSION_HANDLE, CK_USER_TYPE, ctypes.c_char_p, CK_ULONG],
+    "C_Logout": [CK_SESSION_HANDLE],
+    "C_FindObjectsInit": [
+        CK_SESSION_HANDLE, ctypes.POINTER(CK_ATTRIBUTE), CK_ULONG,
+    ],
+    "C_FindObjects": [
+        CK_SESSION_HANDLE, ctypes.POINTER(CK_OBJECT_HANDLE), CK_ULONG,
+        ctypes.POINTER(CK_ULONG),
+    ],
+    "C_FindObjectsFinal": [CK_SESSION_HANDLE],
+    "C_GetAttributeValue": [
+        CK_SESSION_HANDLE, CK_OBJECT_HANDLE, ctypes.POINTER(CK_ATTRIBUTE),
+        CK_ULONG,
+    ],
+    "C_SignInit": [
+        CK_SESSION_HANDLE, ctypes.POINTER(CK_MECHANISM), CK_OBJECT_HANDLE,
+    ],
+    "C_Sign": [
+        CK_SESSION_HANDLE, ctypes.c_char_p, CK_ULONG,
+        ctypes.c_char_p, ctypes.POINTER(CK_ULONG),
+    ],
+}
+
+
+def _declare_pkcs11(lib):
+    """Set argtypes/restype from PKCS11_PROTOTYPES on a loaded module.
+
+    Without this ctypes assumes an int return, which truncates CK_RV on
+    LP64, and converts every argument generically on each call.
     """
-    lib = ctypes.cdll.LoadLibrary(module_path)
-    lib.C_Sign.argtypes = [
-        ctypes.c_ulong, ctypes.c_char_p, ctypes.c_ulong,
-        ctypes.c_char_p, ctypes.POINTER(ctypes.c_ulong),
-    ]
-    lib.C_Sign.restype = ctypes.c_ulong
+    for name, argtypes in PKCS11_PROTOTYPES.items():
+        func = getattr(lib, name)
+        func.argtypes = argtypes
+        func.restype = CK_RV
 
-    rv = lib.C_Initialize(None)
-    if rv != 0:
-        raise RuntimeError(f"C_Initialize failed: 0x{rv:x}")
 
-    try:
-        # Get first slot with a token
-        slot_count = ctypes.c_ulong(0)
-        lib.C_GetSlotList(1, None, ctypes.byref(slot_count))
-        if slot_count.value == 0:
-            raise RuntimeError("no YubiKey detected")
-        slots = (ctypes.c_ulong * slot_count.value)()
-        lib.C_GetSlotList(1, slots, ctypes.byref(slot_count))
-
-        # Open session
-        session = ctypes.c_ulong()
-        rv = lib.C_OpenSession(
-            slots[0], CKF_SERIAL_SESSION | CKF_RW_SESSION,
-            None, None, ctypes.byref(session),
-        )
-        if rv != 0:
-            raise RuntimeError(f"C_OpenSession failed: 0x{rv:x}")
+# Search template for the signing key (CKA_CLASS=private key, CKA_SIGN=true).
+# Built once; the values stay referenced here so the pointers remain valid.
+_CKO_PRIVATE_KEY_VAL = CK_ULONG(CKO_PRIVATE_KEY)
+_CK_TRUE = CK_BBOOL(1)
+_FIND_KEY_ATTRS = (CK_ATTRIBUTE * 2)(
+    CK_ATTRIBUTE(CKA_CLASS, ctypes.addressof(_CKO_PRIVATE_KEY_VAL),
+                 ctypes.sizeof(_CKO_PRIVATE_KEY_VAL)),
+    CK_ATTRIBUTE(CKA_SIGN, ctypes.addressof(_CK_TRUE),
+                 ctypes.sizeof(_CK_TRUE)),
+)
+
+
+# ── PKCS#11 session ─────────────────────────────────────────────────
+
+
+class PKCS11Error(RuntimeError):
+    """A PKCS#11 call returned something other than CKR_OK."""
 
+    def __init__(self, func, rv, hint=""):
+        super().__init__(f"{func} failed: 0x{rv:x}{hint}")
+        self.rv = rv
+
+
+class PKCS11Context:
+    """Long-lived PKCS#11 session with the PIV signing key.
+
+    The module is loaded, initialized, logged in and the signing key looked
+    up once; later signs only run C_SignInit + C_Sign. Before each sign the
+    session is checked with C_GetSessionInfo and rebuilt if it went stale
+    (e.g. after ykman calls or YubiKey re-insertion). After idle_timeout
+    seconds without a sign the token is logged out; the session stays open
+    and logs in again on the next sign.
+
+    get_pin is called whenever the token needs the PIN: at login, and for
+    every signature when the key is marked CKA_ALWAYS_AUTHENTICATE (the
+    default PIN policy for slot 9c).
+    """
+
+    def __init__(self, module_path, get_pin, idle_timeout=IDLE_LOGOUT):
         try:
-            # Login
-            pin_bytes = pin.encode()
-            rv = lib.C_Login(session, CKU_USER, pin_bytes, len(pin_bytes))
+            self.lib = ctypes.cdll.LoadLibrary(module_path)
+            _declare_pkcs11(self.lib)
+        except OSError as e:
+            raise RuntimeError(f"cannot load PKCS#11 module: {e}") from None
+        except AttributeError as e:
+            raise RuntimeError(
+                f"{module_path} is not a PKCS#11 module: {e}"
+            ) from None
+        self.get_pin = get_pin
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.initialized = False
+        self.session = None
+        self.logged_in = False
+        self.key_handle = None
+        self.always_auth = False
+        self.last_used = 0.0
+        self._pin = None
+        self._idle_timer = None
+
+        # Sign buffers, reused by every sign under self.lock: the DigestInfo
+        # prefix is written once and only the 32 digest bytes change
+        self._digest_info = bytearray(SHA256_DER_PREFIX + bytes(32))
+        self._digest_view = memoryview(self._digest_info)[len(SHA256_DER_PREFIX):]
+        self._digest_buf = (ctypes.c_char * len(self._digest_info)).from_buffer(
+            self._digest_info,
+        )
+        self._sig_buf = ctypes.create_string_buffer(256)
+        self._sig_len = CK_ULONG(256)
+        self._mech = CK_MECHANISM(CKM_RSA_PKCS, None, 0)
+
+    def sign(self, digest, touch=True, pin=None):
+        """Sign a SHA-256 digest. Returns raw PKCS#1 v1.5 signature bytes.
+
+        Session loss is retried with a full module re-init, up to
+        SIGN_RETRIES times. A pin (bytearray) passed in is used instead of
+        calling get_pin; like PINs from get_pin it is wiped after the sign.
+        Set touch=False to suppress the touch prompt.
+        """
+        if len(digest) != 32:
+            raise ValueError(f"bad digest length: {len(digest)}")
+
+        with self.lock:
+            self._cancel_idle_timer()
+            self._digest_view[:] = digest
+            self._pin = pin
+            try:
+                for attempt in range(SIGN_RETRIES + 1):
+                    try:
+                        self.ensure_session()
+                        return self._sign(touch)
+                    except PKCS11Error as e:
+                        if e.rv not in CKR_SESSION_LOST or attempt == SIGN_RETRIES:
+                            raise
+                        sys.stderr.write(f"PKCS#11 session lost ({e}), reinitializing...\n")
+                        sys.stderr.flush()
+                        self.reset()
+            finally:
+                wipe(self._pin)
+                self._pin = None
+                self.last_used = time.monotonic()
+                self._start_idle_timer()
+
+    def ensure_session(self):
+        """Make sure there is an open, logged-in session and a key handle."""
+        self._open_session()
+
+        if not self.logged_in:
+            self.key_handle = None
+            self._login(CKU_USER)
+            self.logged_in = True
+
+        if self.key_handle is None:
+            self._find_key()
+
+    def _open_session(self):
+        lib = self.lib
+        if self.session is not None:
+            info = CK_SESSION_INFO()
+            rv = lib.C_GetSessionInfo(self.session, ctypes.byref(info))
+            if rv == 0:
+                self.logged_in = info.state in (
+                    CKS_RO_USER_FUNCTIONS, CKS_RW_USER_FUNCTIONS,
+                )
+            elif rv in CKR_SESSION_LOST:
+                self.reset()
+            else:
+                raise PKCS11Error("C_GetSessionInfo", rv)
+
+        if not self.initialized:
+            rv = lib.C_Initialize(None)
             if rv != 0:
-                raise RuntimeError(f"C_Login failed: 0x{rv:x} (wrong PIN?)")
+                raise PKCS11Error("C_Initialize", rv)
+            self.initialized = True
+
+        if self.session is None:
+            # Get first slot with a token
+            slot_count = ctypes.c_ulong(0)
+            lib.C_GetSlotList(1, None, ctypes.byref(slot_count))
+            if slot_count.value == 0:
+                raise RuntimeError("no YubiKey detected")
+            slots = (ctypes.c_ulong * slot_count.value)()
+            lib.C_GetSlotList(1, slots, ctypes.byref(slot_count))
+
+            session = ctypes.c_ulong()
+            rv = lib.C_OpenSession(
+                slots[0], CKF_SERIAL_SESSION | CKF_RW_SESSION,
+                None, None, ctypes.byref(session),
+            )
+            if rv != 0:
+                raise PKCS11Error("C_OpenSession", rv)
+            self.session = session
+            self.logged_in = False
+
+    def _login(self, user_type):
+        if self._pin is None:
+            pin = self.get_pin()
+            if not isinstance(pin, bytearray):
+                pin = bytearray(pin.encode())
+            self._pin = pin
+        pin = self._pin
+        pin_buf = (ctypes.c_char * len(pin)).from_buffer(pin)
+        rv = self.lib.C_Login(self.session, user_type, pin_buf, len(pin))
+        if rv not in (0, CKR_USER_ALREADY_LOGGED_IN):
+            raise PKCS11Error("C_Login", rv, " (wrong PIN?)")
+
+    def _find_object(self, attrs):
+        """Return the handle of the first object matching attrs, or None."""
+        lib = self.lib
+        rv = lib.C_FindObjectsInit(self.session, attrs, len(attrs))
+        if rv != 0:
+            raise PKCS11Error("C_FindObjectsInit", rv)
+        obj = CK_OBJECT_HANDLE()
+        count = CK_ULONG()
+        lib.C_FindObjects(self.session, ctypes.byref(obj), 1,
+                          ctypes.byref(count))
+        lib.C_FindObjectsFinal(self.session)
+        return obj if count.value else None
+
+    def _get_attribute(self, obj, attr_type):
+        """Read one attribute value: size it with a NULL buffer, then fetch."""
+        attr = CK_ATTRIBUTE(attr_type, None, 0)
+        rv = self.lib.C_GetAttributeValue(self.session, obj, ctypes.byref(attr), 1)
+        if rv != 0:
+            raise PKCS11Error("C_GetAttributeValue", rv)
+        if attr.ulValueLen == CK_UNAVAILABLE_INFORMATION:
+            raise RuntimeError(f"attribute 0x{attr_type:x} not available")
+        buf = ctypes.create_string_buffer(attr.ulValueLen)
+        attr.pValue = ctypes.addressof(buf)
+        rv = self.lib.C_GetAttributeValue(self.session, obj, ctypes.byref(attr), 1)
+        if rv != 0:
+            raise PKCS11Error("C_GetAttributeValue", rv)
+        return buf.raw[:attr.ulValueLen]
+
+    def _find_key(self):
+        """Look up the signing key and whether it needs a PIN per use."""
+        key = self._find_object(_FIND_KEY_ATTRS)
+        if key is None:
+            raise RuntimeError("no signing key found in PIV slot")
 
-            # Find signing key
-            obj_class = ctypes.c_ulong(CKO_PRIVATE_KEY)
-            sign_true = ctypes.c_ubyte(1)
+        try:
+            always_auth = self._get_attribute(key, CKA_ALWAYS_AUTHENTICATE)
+        except RuntimeError:
+            always_auth = b""
+        self.always_auth = any(always_auth)
+        self.key_handle = key
+
+    def public_key_pem(self, slot_id="9c"):
+        """Read the RSA public key of a PIV slot and return it as PEM.
+
+        Public key objects are readable without logging in, so this needs
+        no PIN. Requires the python cryptography package for the PEM
+        encoding.
+        """
+        if RSAPublicNumbers is None:
+            raise RuntimeError("python cryptography package not installed")
+        key_id = PIV_KEY_IDS.get(slot_id.lower())
+        if key_id is None:
+            raise RuntimeError(f"no PKCS#11 key id known for PIV slot {slot_id}")
+
+        with self.lock:
+            self._open_session()
+            obj_class = ctypes.c_ulong(CKO_PUBLIC_KEY)
+            obj_id = ctypes.c_ubyte(key_id)
             attrs = (CK_ATTRIBUTE * 2)(
                 CK_ATTRIBUTE(CKA_CLASS, ctypes.addressof(obj_class),
                              ctypes.sizeof(obj_class)),
-                CK_ATTRIBUTE(CKA_SIGN, ctypes.addressof(sign_true), 1),
+                CK_ATTRIBUTE(CKA_ID, ctypes.addressof(obj_id), 1),
             )
-            rv = lib.C_FindObjectsInit(session, attrs, 2)
-            if rv != 0:
-                raise RuntimeError(f"C_FindObjectsInit failed: 0x{rv:x}")
-            key = ctypes.c_ulong()
-            count = ctypes.c_ulong()
-            lib.C_FindObjects(session, ctypes.byref(key), 1,
-                              ctypes.byref(count))
-            lib.C_FindObjectsFinal(session)
-            if count.value == 0:
-                raise RuntimeError("no signing key found in PIV slot")
-
-            # Build DigestInfo
-            digest_info = SHA256_DER_PREFIX + digest
-            if len(digest_info) != 51:
-                raise ValueError(f"bad DigestInfo length: {len(digest_info)}")
-
-            # Sign
-            mech = CK_MECHANISM(CKM_RSA_PKCS, None, 0)
-            rv = lib.C_SignInit(session, ctypes.byref(mech), key)
-            if rv != 0:
-                raise RuntimeError(f"C_SignInit failed: 0x{rv:x}")
+            obj = self._find_object(attrs)
+            if obj is None:
+                raise RuntimeError(f"no public key found in PIV slot {slot_id}")
+            modulus = self._get_attribute(obj, CKA_MODULUS)
+            exponent = self._get_attribute(obj, CKA_PUBLIC_EXPONENT)
+
+        numbers = RSAPublicNumbers(
+            int.from_bytes(exponent, "big"), int.from_bytes(modulus, "big"),
+        )
+        return numbers.public_key().public_bytes(
+            Encoding.PEM, PublicFormat.SubjectPublicKeyInfo,
+        )
 
-            if touch:
-                sys.stderr.write("Touch your YubiKey...\n")
-                sys.stderr.flush()
+    def _sign(self, touch):
+        lib = self.lib
+        rv = lib.C_SignInit(self.session, ctypes.byref(self._mech), self.key_handle)
+        if rv != 0:
+            raise PKCS11Error("C_SignInit", rv)
+        if self.always_auth:
+            self._login(CKU_CONTEXT_SPECIFIC)
 
-            sig_len = ctypes.c_ulong(256)
-            sig_buf = ctypes.create_string_buffer(256)
-            rv = lib.C_Sign(session, digest_info,
-                            ctypes.c_ulong(len(digest_info)),
-                            sig_buf, ctypes.byref(sig_len))
-            if rv != 0:
-                raise RuntimeError(f"C_Sign failed: 0x{rv:x}")
+        if touch:
+            sys.stderr.write("\n  >>> Touch your YubiKey NOW! <<<\n\n")
+            sys.stderr.flush()
 
-            return sig_buf.raw[:sig_len.value]
-        finally:
-            lib.C_Logout(session)
-            lib.C_CloseSession(session)
-    finally:
-        lib.C_Finalize(None)
+        self._sig_len.value = len(self._sig_buf)
+        rv = lib.C_Sign(self.session, self._digest_buf, len(self._digest_info),
+                        self._sig_buf, ctypes.byref(self._sig_len))
+        if rv != 0:
+            raise PKCS11Error("C_Sign", rv)
+
+        return ctypes.string_at(self._sig_buf, self._sig_len.value)
+
+    def reset(self):
+        """Drop the session and finalize the module (next sign re-inits)."""
+        if self.session is not None:
+            if self.logged_in:
+                self.lib.C_Logout(self.session)
+            self.lib.C_CloseSession(self.session)
+        if self.initialized:
+            self.lib.C_Finalize(None)
+        self.initialized = False
+        self.session = None
+        self.logged_in = False
+        self.key_handle = None
+
+    def close(self):
+        """Log out, close the session and finalize the module."""
+        with self.lock:
+            self._cancel_idle_timer()
+            self.reset()
+
+    def _start_idle_timer(self, delay=None):
+        if self.logged_in and self.idle_timeout > 0:
+            if delay is None:
+                delay = self.idle_timeout
+            self._idle_timer = threading.Timer(delay, self._idle_logout)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _idle_logout(self):
+        with self.lock:
+            # A sign that ran while this timer waited for the lock has
+            # already replaced it with a new one
+            if self._idle_timer is not threading.current_thread():
+                return
+            idle = time.monotonic() - self.last_used
+            if idle < self.idle_timeout:
+                self._start_idle_timer(self.idle_timeout - idle)
+                return
+            if self.session is not None and self.logged_in:
+                self.lib.C_Logout(self.session)
+                sys.stderr.write("Idle, logged out of the YubiKey.\n")
+                sys.stderr.flush()
+            self.logged_in = False
+            self.key_handle = None
+            self._idle_timer = None
 
 
 # ── Helpers ──────────────────────────────────────────────────────────
@@ -258,6 +626,31 @@ def get_pin(pin_command=None):
         )
 
 
+def load_pubkey(module_path, slot_id="9c"):
+    """Read the PIV public key over PKCS#11, falling back to ykman."""
+    ctx = PKCS11Context(module_path, get_pin=None)
+    try:
+        return ctx.public_key_pem(slot_id)
+    except RuntimeError as e:
+        sys.stderr.write(f"PKCS#11 public key read failed ({e}), using ykman\n")
+    finally:
+        # Closed before ykman runs: ykman would invalidate the session
+        ctx.close()
+    return get_pubkey(slot_id)
+
+
+def wipe(buf):
+    """Zero a bytearray (holding a PIN) in place. None is ignored."""
+    if buf:
+        ctypes.memset((ctypes.c_char * len(buf)).from_buffer(buf), 0, len(buf))
+
+
+def pin_prompts(pin_command=None):
+    """True when get_pin would fall back to an interactive prompt."""
+    return not (os.environ.get("PIV_PIN") or pin_command
+                or os.environ.get("PIV_PIN_COMMAND"))
+
+
 def get_pubkey(slot_id="9c"):
     """Export the PIV public key in PEM format via ykman."""
     result = subprocess.run(
@@ -282,83 +675,238 @@ def default_socket_path():
 # ── Socket server ────────────────────────────────────────────────────
 
 
+class AgentServer(socketserver.UnixStreamServer):
+    """Unix socket server handing each connection to a worker pool.
+
+    Connections are read, parsed and answered concurrently by up to
+    AGENT_WORKERS threads; PKCS11Context serializes the actual signing.
+    With same_uid_only, connections from other users are refused (abstract
+    sockets have no file permissions to do that).
+    """
+
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, address, handle_connection, same_uid_only=False):
+        self.handle_connection = handle_connection
+        self.same_uid_only = same_uid_only
+        self.pool = ThreadPoolExecutor(max_workers=AGENT_WORKERS)
+        super().__init__(address, socketserver.BaseRequestHandler)
+
+    def verify_request(self, request, client_address):
+        if not self.same_uid_only:
+            return True
+        creds = request.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"),
+        )
+        _, uid, _ = struct.unpack("3i", creds)
+        if uid != os.getuid():
+            sys.stderr.write(f"Refused connection from uid {uid}\n")
+            sys.stderr.flush()
+            return False
+        return True
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._serve, request, client_address)
+
+    def _serve(self, request, client_address):
+        try:
+            request.settimeout(CONNECTION_TIMEOUT)
+            self.handle_connection(request)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
 class PIVSignAgent:
     """Unix socket server that signs digests via YubiKey PIV."""
 
     def __init__(self, module_path, pubkey_pem, sock_path,
-                 pin_command=None, touch=True):
+                 pin_command=None, touch=True, pin_ttl=PIN_TTL):
         self.module_path = module_path
         self.pubkey_pem = pubkey_pem
-        self.pubkey_b64 = base64.b64encode(pubkey_pem).decode()
+        self._pubkey_response = b"OK " + base64.b64encode(pubkey_pem) + b"\n"
         self.sock_path = sock_path
+        self.abstract = sock_path.startswith("@")
         self.pin_command = pin_command
         self.touch = touch
+        self.pin_ttl = pin_ttl
+        self._pin = None
+        self._pin_lock = threading.Lock()
+        self._pin_timer = None
+        self._pin_expires = 0.0
+        self._pin_refill = None
+        self._pin_generation = 0
+        self.pkcs11 = PKCS11Context(module_path, self.fetch_pin)
         self.server = None
 
     def handle_sign(self, hex_digest):
-        """Fetch PIN, open PKCS#11, sign, close. Returns response string."""
+        """Sign a hex digest over the cached PKCS#11 session.
+
+        Returns the response line (bytes, newline included).
+        """
         try:
-            digest = bytes.fromhex(hex_digest)
+            digest = binascii.a2b_hex(hex_digest)
         except ValueError:
-            return "ERR invalid hex digest"
+            return b"ERR invalid hex digest\n"
         if len(digest) != 32:
-            return f"ERR digest must be 32 bytes, got {len(digest)}"
+            return f"ERR digest must be 32 bytes, got {len(digest)}\n".encode()
 
-        # Fetch PIN
-        sys.stderr.write("Fetching PIV PIN...\n")
-        sys.stderr.flush()
         try:
-            pin = get_pin(self.pin_command)
-        except RuntimeError as e:
-            return f"ERR {e}"
-
-        # Sign with a fresh PKCS#11 session
-        if self.touch:
-            sys.stderr.write("\n  >>> Touch your YubiKey NOW! <<<\n\n")
-            sys.stderr.flush()
-        try:
-            sig = pkcs11_sign(self.module_path, pin, digest, self.touch)
+            # A PIN from PIV_PIN or the pin command is fetched before taking
+            # the signing lock, so concurrent requests don't queue for it.
+            # Interactive prompts happen under the lock, one at a time.
+            pin = None
+            if not pin_prompts(self.pin_command):
+                pin = self.fetch_pin()
+            sig = self.pkcs11.sign(digest, self.touch, pin)
+            self.refill_pin()
             if self.touch:
                 sys.stderr.write("Signature complete.\n")
                 sys.stderr.flush()
-            return f"OK {base64.b64encode(sig).decode()}"
+            return b"OK " + binascii.b2a_base64(sig)
+        except PKCS11Error as e:
+            # Drop a rejected PIN so the next request fetches a new one.
+            # Not retried here: every wrong attempt counts towards the
+            # YubiKey's PIN lockout.
+            if e.rv in (CKR_PIN_INCORRECT, CKR_PIN_INVALID, CKR_PIN_LEN_RANGE):
+                self.forget_pin()
+            return f"ERR {e}\n".encode()
         except RuntimeError as e:
-            return f"ERR {e}"
+            return f"ERR {e}\n".encode()
+
+    def fetch_pin(self):
+        """Return a copy of the PIV PIN, fetched at most once per pin_ttl.
+
+        The cached PIN is a bytearray that is wiped when the TTL runs out;
+        the caller owns (and wipes) the returned copy.
+        """
+        with self._pin_lock:
+            if self._pin is None:
+                sys.stderr.write("Fetching PIV PIN...\n")
+                sys.stderr.flush()
+                pin = bytearray(get_pin(self.pin_command).encode())
+                if self.pin_ttl <= 0:
+                    return pin
+                self._cache_pin(pin)
+            return bytearray(self._pin)
+
+    def refill_pin(self):
+        """Re-run the pin command in the background once half the TTL is gone.
+
+        Called after each successful sign, so during a batch the next sign
+        finds a cached PIN instead of waiting for the command. Only for
+        PIV_PIN_COMMAND / --pin-command: PIV_PIN needs no fetching and an
+        interactive prompt can't run in the background.
+        """
+        if self.pin_ttl <= 0 or os.environ.get("PIV_PIN"):
+            return
+        if not (self.pin_command or os.environ.get("PIV_PIN_COMMAND")):
+            return
+        with self._pin_lock:
+            if self._pin_refill is not None:
+                return
+            if (self._pin is not None
+                    and self._pin_expires - time.monotonic() > self.pin_ttl / 2):
+                return
+            self._pin_refill = threading.Thread(
+                target=self._refill, args=(self._pin_generation,), daemon=True,
+            )
+            self._pin_refill.start()
+
+    def _refill(self, generation):
+        try:
+            pin = bytearray(get_pin(self.pin_command).encode())
+        except RuntimeError:
+            # Left for the next sign to fetch (and report) synchronously.
+            pin = None
+        with self._pin_lock:
+            self._pin_refill = None
+            if pin is None:
+                return
+            if generation != self._pin_generation:
+                # forget_pin() ran meanwhile (e.g. PIN rejected): don't
+                # bring back a PIN fetched before that.
+                wipe(pin)
+                return
+            self._cache_pin(pin)
+
+    def _cache_pin(self, pin):
+        """Replace the cached PIN and restart its TTL. Caller holds _pin_lock."""
+        if self._pin_timer is not None:
+            self._pin_timer.cancel()
+        wipe(self._pin)
+        self._pin = pin
+        self._pin_expires = time.monotonic() + self.pin_ttl
+        self._pin_timer = threading.Timer(self.pin_ttl, self._pin_expired)
+        self._pin_timer.daemon = True
+        self._pin_timer.start()
+
+    def forget_pin(self):
+        """Wipe the cached PIN."""
+        with self._pin_lock:
+            self._forget_pin()
+
+    def _pin_expired(self):
+        with self._pin_lock:
+            # Ignore a timer that fired while _cache_pin replaced it
+            if self._pin_timer is threading.current_thread():
+                self._forget_pin()
+
+    def _forget_pin(self):
+        """Wipe the cached PIN. Caller holds _pin_lock."""
+        self._pin_generation += 1
+        if self._pin_timer is not None:
+            self._pin_timer.cancel()
+            self._pin_timer = None
+        wipe(self._pin)
+        self._pin = None
 
     def handle_request(self, line):
-        """Process a single request line. Returns response string."""
-        line = line.strip()
-        if not line:
-            return "ERR empty request"
+        """Process a single request line (bytes). Returns the response line."""
+        line = line.lstrip()
+        if line.startswith(_SIGN_PREFIX):
+            return self.handle_sign(line[len(_SIGN_PREFIX):].rstrip())
 
-        if line == "PUBKEY":
-            return f"OK {self.pubkey_b64}"
+        line = line.rstrip()
+        if not line:
+            return b"ERR empty request\n"
 
-        if line.startswith("SIGN SHA256 "):
-            hex_digest = line[len("SIGN SHA256 "):]
-            return self.handle_sign(hex_digest)
+        if line == b"PUBKEY":
+            return self._pubkey_response
 
-        return "ERR unknown command"
+        return b"ERR unknown command\n"
 
     def handle_connection(self, conn):
-        """Handle one client connection (one request-response)."""
-        try:
-            data = b""
-            while b"\n" not in data:
-                chunk = conn.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if len(data) > 8192:
-                    conn.sendall(b"ERR request too large\n")
-                    return
-
-            if not data:
-                return
+        """Handle one client connection.
 
-            line = data.split(b"\n")[0].decode("utf-8", errors="replace")
-            response = self.handle_request(line)
-            conn.sendall((response + "\n").encode())
+        One request-response, or after a STREAM request, every request
+        until the client closes the connection.
+        """
+        try:
+            stream = False
+            with conn.makefile("rb", buffering=8192) as rfile:
+                while True:
+                    data = rfile.readline(8193)
+                    if len(data) > 8192:
+                        conn.sendall(b"ERR request too large\n")
+                        return
+
+                    if not data:
+                        return
+
+                    if not stream and data.strip() == b"STREAM":
+                        stream = True
+                        conn.sendall(b"OK STREAM\n")
+                        continue
+
+                    conn.sendall(self.handle_request(data))
+                    if not stream:
+                        return
         except Exception as e:
             try:
                 conn.sendall(f"ERR {e}\n".encode())
@@ -367,17 +915,19 @@ class PIVSignAgent:
 
     def run(self):
         """Start the agent and listen for connections."""
-        sock_dir = os.path.dirname(self.sock_path)
-        os.makedirs(sock_dir, mode=0o700, exist_ok=True)
+        if self.abstract:
+            self.server = AgentServer("\0" + self.sock_path[1:],
+                                      self.handle_connection, same_uid_only=True)
+        else:
+            sock_dir = os.path.dirname(self.sock_path)
+            os.makedirs(sock_dir, mode=0o700, exist_ok=True)
 
-        # Remove stale socket
-        if os.path.exists(self.sock_path):
-            os.unlink(self.sock_path)
+            # Remove stale socket
+            if os.path.exists(self.sock_path):
+                os.unlink(self.sock_path)
 
-        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self.server.bind(self.sock_path)
-        os.chmod(self.sock_path, 0o600)
-        self.server.listen(1)
+            self.server = AgentServer(self.sock_path, self.handle_connection)
+            os.chmod(self.sock_path, 0o600)
 
         atexit.register(self.cleanup)
         signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
@@ -386,19 +936,16 @@ class PIVSignAgent:
         sys.stderr.write(f"PIV signing agent listening on {self.sock_path}\n")
         sys.stderr.flush()
 
-        while True:
-            conn, _ = self.server.accept()
-            try:
-                self.handle_connection(conn)
-            finally:
-                conn.close()
+        self.server.serve_forever()
 
     def cleanup(self):
-        """Remove socket file on exit."""
+        """Log out of the YubiKey, wipe the PIN and remove socket file on exit."""
+        self.pkcs11.close()
+        self.forget_pin()
         if self.server:
-            self.server.close()
+            self.server.server_close()
             self.server = None
-        if os.path.exists(self.sock_path):
+        if not self.abstract and os.path.exists(self.sock_path):
             os.unlink(self.sock_path)
 
 
@@ -407,54 +954,42 @@ class PIVSignAgent:
 
 def self_test(module_path, pubkey_pem, pin_command=None, touch=True):
     """Fetch PIN, sign a test digest, verify the signature."""
+    if RSAPublicNumbers is None:
+        sys.stderr.write(
+            "Self-test: FAILED — python cryptography package needed to verify\n"
+        )
+        return False
+
     test_data = b"piv-sign-agent self-test"
     digest = hashlib.sha256(test_data).digest()
 
     sys.stderr.write("Self-test: fetching PIN and signing...\n")
+    ctx = PKCS11Context(module_path, lambda: get_pin(pin_command))
     try:
-        pin = get_pin(pin_command)
+        sig = ctx.sign(digest, touch)
     except RuntimeError as e:
         sys.stderr.write(f"Self-test: FAILED — {e}\n")
         return False
+    finally:
+        ctx.close()
+    sys.stderr.write(f"Self-test: got {len(sig)} byte signature\n")
 
+    # Verify against the public key (PKCS#1 v1.5 over SHA-256(test_data))
     try:
-        sig = pkcs11_sign(module_path, pin, digest, touch)
-    except RuntimeError as e:
-        sys.stderr.write(f"Self-test: FAILED — {e}\n")
+        pub = load_pem_public_key(pubkey_pem)
+        pub.verify(sig, test_data, padding.PKCS1v15(), hashes.SHA256())
+    except ValueError as e:
+        sys.stderr.write(f"Self-test: FAILED — bad public key: {e}\n")
         return False
-    sys.stderr.write(f"Self-test: got {len(sig)} byte signature\n")
-
-    # Verify with openssl
-    with tempfile.NamedTemporaryFile(suffix=".pem") as pub_f, \
-         tempfile.NamedTemporaryFile(suffix=".sig") as sig_f:
-        pub_f.write(pubkey_pem)
-        pub_f.flush()
-        sig_f.write(sig)
-        sig_f.flush()
-
-        result = subprocess.run(
-            [
-                "openssl", "rsautl", "-verify",
-                "-pubin", "-inkey", pub_f.name,
-                "-in", sig_f.name,
-            ],
-            capture_output=True,
+    except InvalidSignature:
+        sys.stderr.write(
+            f"Self-test: FAILED — signature does not verify\n"
+            f"  digest: {digest.hex()}\n"
         )
-        if result.returncode != 0:
-            sys.stderr.write("Self-test: FAILED — openssl verify error\n")
-            return False
+        return False
 
-        recovered = result.stdout[-32:]
-        if recovered == digest:
-            sys.stderr.write("Self-test: PASSED\n")
-            return True
-        else:
-            sys.stderr.write(
-                f"Self-test: FAILED\n"
-                f"  expected: {digest.hex()}\n"
-                f"  got:      {recovered.hex()}\n"
-            )
-            return False
+    sys.stderr.write("Self-test: PASSED\n")
+    return True
 
 
 # ── Main ─────────────────────────────────────────────────────────────
@@ -467,18 +1002,18 @@ def load_dotenv():
     )
     try:
         with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                key, _, value = line.partition("=")
-                key = key.strip()
-                value = value.strip()
-                if not key:
-                    continue
-                os.environ.setdefault(key, value)
+            text = f.read()
     except FileNotFoundError:
-        pass
+        return
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, value = line.partition("=")
+        key = key.strip()
+        if key:
+            os.environ.setdefault(key, value.strip())
 
 
 def main():
@@ -490,7 +1025,14 @@ def main():
     parser.add_argument(
         "--socket",
         default=default_socket_path(),
-        help="Unix socket path (default: %(default)s)",
+        help="Unix socket path, or @name for a Linux abstract socket "
+             "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--abstract",
+        action="store_true",
+        help=f"Listen on the Linux abstract socket {ABSTRACT_SOCKET} "
+             "(local clients only; cannot be forwarded with ssh -R)",
     )
     parser.add_argument(
         "--slot",
@@ -503,6 +1045,12 @@ def main():
         help="Shell command that prints the PIV PIN to stdout "
              "(default: PIV_PIN_COMMAND env var)",
     )
+    parser.add_argument(
+        "--pin-ttl",
+        type=int, default=PIN_TTL, metavar="SECONDS",
+        help="Keep a fetched PIN in memory this long; 0 fetches it for "
+             "every use (default: %(default)s)",
+    )
     parser.add_argument(
         "--touch", dest="touch",
         action="store_true", default=True,
@@ -516,9 +1064,14 @@ def main():
     parser.add_argument(
         "--test",
         action="store_true",
-        help="Run self-test (sign and verify a test digest), then exit",
+        help="Run self-test (sign and verify a test digest; needs python "
+             "cryptography), then exit",
     )
     args = parser.parse_args()
+    if args.abstract:
+        args.socket = ABSTRACT_SOCKET
+    if args.socket.startswith("@") and not sys.platform.startswith("linux"):
+        parser.error("abstract sockets are only available on Linux")
 
     # Find PKCS#11 module
     try:
@@ -528,9 +1081,9 @@ def main():
         sys.exit(1)
     sys.stderr.write(f"PKCS#11 module: {module_path}\n")
 
-    # Export public key (before any PKCS#11 — ykman would invalidate sessions)
+    # Read public key (its PKCS#11 session is closed again before signing)
     try:
-        pubkey_pem = get_pubkey(args.slot)
+        pubkey_pem = load_pubkey(module_path, args.slot)
     except RuntimeError as e:
         sys.stderr.write(f"ERROR: {e}\n")
         sys.exit(1)
@@ -543,7 +1096,7 @@ def main():
 
     # Run agent
     agent = PIVSignAgent(module_path, pubkey_pem, args.socket,
-                         args.pin_command, args.touch)
+                         args.pin_command, args.touch, args.pin_ttl)
     try:
         agent.run()
     except KeyboardInterrupt:
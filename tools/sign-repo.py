@@ -36,9 +36,13 @@
 # The PIV signing agent (piv-sign-agent.py) runs on the local workstation
 # with the YubiKey. Its Unix socket is forwarded to this host via SSH -R.
 #
-# Optional: PIV_AGENT_SOCK (forwarded socket path, default /tmp/piv-sign-agent.sock)
+# Optional: PIV_AGENT_SOCK (forwarded socket path, default /tmp/piv-sign-agent.sock;
+#                           @name for a local Linux abstract socket)
 #           REPO_PUB (path to public key PEM file, overrides agent PUBKEY)
 #
+# When the public key comes from the agent, PUBKEY and SIGN are sent over
+# one connection using the agent's STREAM mode.
+#
 
 import base64
 import hashlib
@@ -52,35 +56,55 @@ def die(msg):
     sys.exit(1)
 
 
-def agent_request(sock_path, request):
-    """Send a request to the PIV signing agent and return the response."""
-    try:
-        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        s.settimeout(60)
-        s.connect(sock_path)
-        s.sendall((request + "\n").encode())
-
-        data = b""
-        while b"\n" not in data:
-            chunk = s.recv(4096)
-            if not chunk:
-                break
-            data += chunk
-        s.close()
-    except socket.error as e:
-        die(f"cannot connect to PIV agent at {sock_path}: {e}")
-
-    line = data.split(b"\n")[0].decode()
-    if line.startswith("OK "):
-        return line[3:]
-    elif line.startswith("ERR "):
-        die(f"agent error: {line[4:]}")
-    else:
-        die(f"unexpected agent response: {line}")
-
-
-def find_repo_pub(sock_path):
-    """Get the public key PEM: from file (REPO_PUB) or from the agent."""
+class AgentConnection:
+    """Connection to the PIV signing agent.
+
+    With stream=True the agent is switched to STREAM mode so several
+    requests share the connection; otherwise it serves one request.
+    """
+
+    def __init__(self, sock_path, stream=False):
+        self.sock_path = sock_path
+        try:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(60)
+            # @name is a Linux abstract socket
+            if sock_path.startswith("@"):
+                self.sock.connect("\0" + sock_path[1:])
+            else:
+                self.sock.connect(sock_path)
+        except socket.error as e:
+            die(f"cannot connect to PIV agent at {sock_path}: {e}")
+        self.rfile = self.sock.makefile("rb")
+        if stream:
+            self.request("STREAM")
+
+    def request(self, request):
+        """Send a request to the PIV signing agent and return the response."""
+        try:
+            self.sock.sendall((request + "\n").encode())
+            data = self.rfile.readline()
+        except socket.error as e:
+            die(f"cannot connect to PIV agent at {self.sock_path}: {e}")
+
+        line = data.split(b"\n")[0].decode()
+        if line.startswith("OK "):
+            return line[3:]
+        elif line.startswith("ERR "):
+            die(f"agent error: {line[4:]}")
+        else:
+            die(f"unexpected agent response: {line}")
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+def find_repo_pub():
+    """Get the public key PEM from file (REPO_PUB or next to this script).
+
+    Returns None when there is no file; the key then comes from the agent.
+    """
     env_path = os.environ.get("REPO_PUB")
     if env_path and os.path.isfile(env_path):
         with open(env_path, "rb") as f:
@@ -92,17 +116,14 @@ def find_repo_pub(sock_path):
     if os.path.isfile(path):
         with open(path, "rb") as f:
             return f.read()
-
-    # Ask the agent
-    b64 = agent_request(sock_path, "PUBKEY")
-    return base64.b64decode(b64)
+    return None
 
 
 def main():
     sock_path = os.environ.get("PIV_AGENT_SOCK", "/tmp/piv-sign-agent.sock")
 
-    # Get public key
-    pub_pem = find_repo_pub(sock_path)
+    # Get public key (None: ask the agent below)
+    pub_pem = find_repo_pub()
 
     # pkg repo sends SHA256(data) as a hex string on stdin. It doesn't close
     # stdin, so read one line only. pkg verifies against SHA256(hex_string),
@@ -111,18 +132,26 @@ def main():
     if not hex_hash:
         die("no hash received on stdin")
 
-    double_hash = hashlib.sha256(hex_hash.encode()).digest()
-
-    # Sign via PIV agent
-    sig_b64 = agent_request(sock_path, f"SIGN SHA256 {double_hash.hex()}")
+    # hashlib's SHA-256 is OpenSSL's EVP implementation, which already uses
+    # the CPU's SHA extensions (SHA-NI, ARMv8 crypto) where available.
+    try:
+        double_hash = hashlib.sha256(hex_hash.encode("ascii")).hexdigest()
+    except UnicodeEncodeError:
+        die("hash received on stdin is not ASCII hex")
+
+    # Sign via PIV agent. If the agent also has to provide the public key,
+    # PUBKEY and SIGN share one STREAM connection.
+    agent = AgentConnection(sock_path, stream=pub_pem is None)
+    if pub_pem is None:
+        pub_pem = base64.b64decode(agent.request("PUBKEY"))
+    sig_b64 = agent.request(f"SIGN SHA256 {double_hash}")
+    agent.close()
     sig = base64.b64decode(sig_b64)
 
-    # Output in the format pkg expects
-    sys.stdout.buffer.write(b"SIGNATURE\n")
-    sys.stdout.buffer.write(sig)
-    sys.stdout.buffer.write(b"\nCERT\n")
-    sys.stdout.buffer.write(pub_pem)
-    sys.stdout.buffer.write(b"END\n")
+    # Output in the format pkg expects, as a single write
+    sys.stdout.buffer.write(
+        b"SIGNATURE\n" + sig + b"\nCERT\n" + pub_pem + b"END\n"
+    )
     sys.stdout.buffer.flush()
 
 